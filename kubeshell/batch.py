@@ -0,0 +1,94 @@
+from __future__ import print_function, absolute_import, unicode_literals
+
+import time
+from multiprocessing.pool import ThreadPool
+
+import click
+
+
+class CommandResult(object):
+    """Outcome of one script line run by `BatchRunner`."""
+
+    def __init__(self, lineno, command, status, seconds, output=None):
+        self.lineno = lineno
+        self.command = command
+        self.status = status
+        self.seconds = seconds
+        self.output = output
+
+
+class BatchRunner(object):
+    """Run kube-shell command lines from a script instead of the prompt.
+
+    Each line runs as its own command, the same way the shell runs it but
+    without highlighting, so output is left as the command wrote it. The
+    commands don't share kube-shell's kubeconfig, API clients or caches.
+    Blank lines split the script into blocks that run one after the other;
+    the lines of a block are independent of each other and run
+    concurrently, at most `parallel` at a time. Lines starting with '#' are
+    comments, and 'exit' ends the script.
+
+    :type shell: Kubeshell
+    :param shell: Shell used to execute each line.
+
+    :type parallel: int
+    :param parallel: Maximum number of lines of a block running at once.
+
+    """
+
+    def __init__(self, shell, parallel=1):
+        self.shell = shell
+        self.parallel = max(1, parallel)
+
+    def parse(self, script):
+        blocks = [[]]
+        for lineno, line in enumerate(script, 1):
+            command = line.strip()
+            if not command:
+                blocks.append([])
+            elif command == "exit":
+                break
+            elif command.startswith("#") or command == "clear":
+                continue
+            else:
+                blocks[-1].append((lineno, command))
+        return [block for block in blocks if block]
+
+    def run(self, script):
+        """Run every line of `script` and print a summary; return the exit status."""
+        results = []
+        pool = ThreadPool(self.parallel) if self.parallel > 1 else None
+        try:
+            for block in self.parse(script):
+                if pool is None or len(block) == 1:
+                    results.extend(self.run_command(lineno, command) for lineno, command in block)
+                    continue
+                # concurrent lines can't share the terminal, so their output
+                # is collected and printed in script order
+                for result in pool.map(lambda line: self.run_command(*line, capture=True), block):
+                    self.print_output(result)
+                    results.append(result)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        self.print_summary(results)
+        return 0 if all(result.status == 0 for result in results) else 1
+
+    def run_command(self, lineno, command, capture=False):
+        started = time.time()
+        status, output = self.shell.execute(command, capture=capture, highlight=False)
+        return CommandResult(lineno, command, status, time.time() - started, output)
+
+    def print_output(self, result):
+        click.secho("# {0}: {1}".format(result.lineno, result.command), bold=True)
+        if result.output:
+            click.echo(result.output, nl=False)
+
+    def print_summary(self, results):
+        click.echo("{0:>6}  {1:>6}  {2:>8}  {3}".format("line", "status", "seconds", "command"), err=True)
+        for result in results:
+            click.secho("{0:>6}  {1:>6}  {2:>8.2f}  {3}".format(result.lineno, result.status, result.seconds,
+                                                             result.command),
+                        fg=None if result.status == 0 else "red", err=True)
@@ -6,7 +6,27 @@ import shlex
 import json
 import os
 import os.path
+import functools
+import logging
+import threading
+import time
 from kubernetes import client, config
+from kubernetes.client.rest import ApiException
+
+from kubeshell.throttle import TokenBucket, SingleFlight, CircuitBreaker, RequestStats, is_retryable, backoff_delay
+from kubeshell.transport import RESOURCE_PATHS, list_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def env_number(name, default, convert=float):
+    """Read a positive number from the environment, falling back to `default` if it isn't one."""
+    try:
+        value = convert(os.environ.get(name, default))
+    except ValueError:
+        return default
+    return value if value > 0 else default
+
 
 class KubectlCompleter(Completer):
 
@@ -17,6 +37,40 @@ class KubectlCompleter(Completer):
         self.global_opts = []
         self.inline_help = True
         self.namespace = ""
+        self.context = ""
+        # kubeconfig used for server side completion, None for the default location
+        self.kubeconfig = None
+
+        # (context, resource kind) -> (fetch time, [(name, namespace), ...]) across
+        # all namespaces. Expired entries are kept to complete from while offline.
+        self.resource_cache = {}
+        self.cache_ttl = 60
+        self.cache_generation = 0
+        self.cache_lock = threading.Lock()
+
+        # completion traffic is bounded by a token bucket and identical lists
+        # in flight at the same time are issued only once
+        self.rate_limiter = TokenBucket(env_number("KUBE_SHELL_QPS", 5.0),
+                                        env_number("KUBE_SHELL_BURST", 10, int))
+        self.rate_limit_wait = 1.0
+        self.max_retries = 2
+        self.single_flight = SingleFlight()
+        self.request_stats = RequestStats()
+
+        # completion gives up quickly on unreachable API servers, and stops
+        # calling one that keeps failing until its breaker lets a call through
+        self.connect_timeout = 1.0
+        self.read_timeout = 5.0
+        self.breakers = {}
+
+        # API clients are reused per context so connections are pooled
+        self.api_clients = {}
+        self.api_client_ttl = 300
+        self.api_client_lock = threading.Lock()
+
+        # "protobuf" lists resources as gzipped protobuf and decodes only their
+        # metadata, anything else goes through the client's JSON models
+        self.transport = os.environ.get("KUBE_SHELL_TRANSPORT", "json")
 
         try:
             DATA_DIR = os.path.dirname(os.path.realpath(__file__))
@@ -33,6 +87,59 @@ class KubectlCompleter(Completer):
     def set_namespace(self, namespace):
         self.namespace = namespace
 
+    def set_context(self, context):
+        self.context = context
+
+    def invalidate_cache(self):
+        # bumping the generation makes fetches started against the previous
+        # context drop their results instead of storing them
+        with self.cache_lock:
+            self.cache_generation += 1
+            for key, (fetched_at, items) in self.resource_cache.items():
+                self.resource_cache[key] = (0, items)
+
+    def get_cached_resources(self, resource):
+        with self.cache_lock:
+            entry = self.resource_cache.get((self.context, resource))
+        if entry is None:
+            return None
+        fetched_at, items = entry
+        if time.time() - fetched_at > self.cache_ttl:
+            return None
+        return items
+
+    def get_stale_resources(self, context, resource):
+        """Last known items of `resource` in `context`, empty if it was never fetched."""
+        with self.cache_lock:
+            entry = self.resource_cache.get((context, resource))
+        return [] if entry is None else entry[1]
+
+    def get_breaker(self, context=None):
+        context = self.context if context is None else context
+        with self.cache_lock:
+            breaker = self.breakers.get(context)
+            if breaker is None:
+                breaker = self.breakers[context] = CircuitBreaker()
+        return breaker
+
+    def is_offline(self):
+        return self.get_breaker().is_open()
+
+    def get_api_client(self, context):
+        key = (self.kubeconfig, context)
+        with self.api_client_lock:
+            entry = self.api_clients.get(key)
+            # recreate clients now and then so refreshed credentials are picked up
+            if entry is None or time.time() - entry[0] > self.api_client_ttl:
+                configuration = client.Configuration()
+                config.load_kube_config(config_file=self.kubeconfig, context=context or None,
+                                        client_configuration=configuration)
+                api_client = client.ApiClient(configuration=configuration)
+                # fail fast rather than letting urllib3 retry an unreachable server
+                api_client.rest_client.pool_manager.connection_pool_kw["retries"] = False
+                entry = self.api_clients[key] = (time.time(), api_client)
+        return entry[1]
+
     def populate_cmds_args_opts(self, key_map):
         for key in key_map.keys():
             self.all_commands.append(key)
@@ -274,96 +381,158 @@ class KubectlCompleter(Completer):
         return
 
     def get_resources(self, resource, namespace="all"):
+        items = self.get_cached_resources(resource)
+        if items is not None:
+            self.request_stats.incr("cache_hits")
+        else:
+            # a call started before the cache was invalidated (context switch,
+            # command run) must not be joined, its result would be dropped
+            key = (self.context, self.cache_generation, resource)
+            items, shared = self.single_flight.do(key, lambda: self.fetch_resources(resource))
+            if shared:
+                self.request_stats.incr("coalesced")
+        if items is None:
+            return None
+
         resources = []
+        for name, item_namespace in items:
+            # cluster scoped resources have no namespace and are always listed
+            if namespace == "all" or item_namespace is None or namespace == item_namespace:
+                resources.append((name, item_namespace))
+        return resources
+
+    def fetch_resources(self, resource):
+        context = self.context
+        with self.cache_lock:
+            generation = self.cache_generation
+
         try:
-            config.load_kube_config()
+            api_client = self.get_api_client(context)
         except  Exception as e:
-            # TODO: log errors to log file
-            return resources
+            logger.warning("could not load kubeconfig for context %r", context, exc_info=True)
+            return []
 
-        v1 = client.CoreV1Api()
-        v1Beta1 = client.AppsV1beta1Api()
-        extensionsV1Beta1 = client.ExtensionsV1beta1Api()
-        autoscalingV1Api = client.AutoscalingV1Api()
-        rbacAPi = client.RbacAuthorizationV1beta1Api()
-        batchV1Api = client.BatchV1Api()
-        batchV2Api = client.BatchV2alpha1Api()
+        v1 = client.CoreV1Api(api_client)
+        v1Beta1 = client.AppsV1beta1Api(api_client)
+        extensionsV1Beta1 = client.ExtensionsV1beta1Api(api_client)
+        autoscalingV1Api = client.AutoscalingV1Api(api_client)
+        rbacAPi = client.RbacAuthorizationV1beta1Api(api_client)
+        batchV1Api = client.BatchV1Api(api_client)
+        batchV2Api = client.BatchV2alpha1Api(api_client)
 
-        ret = None
-        namespaced_resource = True
+        list_fn = None
 
         if resource == "pod":
-            ret = v1.list_pod_for_all_namespaces(watch=False)
+            list_fn = v1.list_pod_for_all_namespaces
         elif resource == "service":
-            ret = v1.list_service_for_all_namespaces(watch=False)
+            list_fn = v1.list_service_for_all_namespaces
         elif resource == "deployment":
-            ret = v1Beta1.list_deployment_for_all_namespaces(watch=False)
+            list_fn = v1Beta1.list_deployment_for_all_namespaces
         elif resource == "statefulset":
-            ret = v1Beta1.list_stateful_set_for_all_namespaces(watch=False)
+            list_fn = v1Beta1.list_stateful_set_for_all_namespaces
         elif resource == "node":
-            namespaced_resource = False
-            ret = v1.list_node(watch=False)
+            list_fn = v1.list_node
         elif resource == "namespace":
-            namespaced_resource = False
-            ret = v1.list_namespace(watch=False)
+            list_fn = v1.list_namespace
         elif resource == "daemonset":
-            ret = extensionsV1Beta1.list_daemon_set_for_all_namespaces(watch=False)
+            list_fn = extensionsV1Beta1.list_daemon_set_for_all_namespaces
         elif resource == "networkpolicy":
-            ret = extensionsV1Beta1.list_network_policy_for_all_namespaces(watch=False)
+            list_fn = extensionsV1Beta1.list_network_policy_for_all_namespaces
         elif resource == "thirdpartyresource":
-            namespaced_resource = False
-            ret = extensionsV1Beta1.list_third_party_resource(watch=False)
+            list_fn = extensionsV1Beta1.list_third_party_resource
         elif resource == "replicationcontroller":
-            ret = v1.list_replication_controller_for_all_namespaces(watch=False)
+            list_fn = v1.list_replication_controller_for_all_namespaces
         elif resource == "replicaset":
-            ret = extensionsV1Beta1.list_replica_set_for_all_namespaces(watch=False)
+            list_fn = extensionsV1Beta1.list_replica_set_for_all_namespaces
         elif resource == "ingress":
-            ret = extensionsV1Beta1.list_ingress_for_all_namespaces(watch=False)
+            list_fn = extensionsV1Beta1.list_ingress_for_all_namespaces
         elif resource == "endpoints":
-            ret = v1.list_endpoints_for_all_namespaces(watch=False)
+            list_fn = v1.list_endpoints_for_all_namespaces
         elif resource == "configmap":
-            ret = v1.list_config_map_for_all_namespaces(watch=False)
+            list_fn = v1.list_config_map_for_all_namespaces
         elif resource == "event":
-            ret = v1.list_event_for_all_namespaces(watch=False)
+            list_fn = v1.list_event_for_all_namespaces
         elif resource == "limitrange":
-            ret = v1.list_limit_range_for_all_namespaces(watch=False)
+            list_fn = v1.list_limit_range_for_all_namespaces
         elif resource == "configmap":
-            ret = v1.list_config_map_for_all_namespaces(watch=False)
+            list_fn = v1.list_config_map_for_all_namespaces
         elif resource == "persistentvolume":
-            namespaced_resource = False
-            ret = v1.list_persistent_volume(watch=False)
+            list_fn = v1.list_persistent_volume
         elif resource == "secret":
-            ret = v1.list_secret_for_all_namespaces(watch=False)
+            list_fn = v1.list_secret_for_all_namespaces
         elif resource == "resourcequota":
-            ret = v1.list_resource_quota_for_all_namespaces(watch=False)
+            list_fn = v1.list_resource_quota_for_all_namespaces
         elif resource == "componentstatus":
-            namespaced_resource = False
-            ret = v1.list_component_status(watch=False)
+            list_fn = v1.list_component_status
         elif resource == "podtemplate":
-            ret = v1.list_pod_template_for_all_namespaces(watch=False)
+            list_fn = v1.list_pod_template_for_all_namespaces
         elif resource == "serviceaccount":
-            ret = v1.list_service_account_for_all_namespaces(watch=False)
+            list_fn = v1.list_service_account_for_all_namespaces
         elif resource == "horizontalpodautoscaler":
-            ret = autoscalingV1Api.list_horizontal_pod_autoscaler_for_all_namespaces(watch=False)
+            list_fn = autoscalingV1Api.list_horizontal_pod_autoscaler_for_all_namespaces
         elif resource == "clusterrole":
-            namespaced_resource = False
-            ret = rbacAPi.list_cluster_role(watch=False)
+            list_fn = rbacAPi.list_cluster_role
         elif resource == "clusterrolebinding":
-            namespaced_resource = False
-            ret = rbacAPi.list_cluster_role_binding(watch=False)
+            list_fn = rbacAPi.list_cluster_role_binding
         elif resource == "job":
-            ret = batchV1Api.list_job_for_all_namespaces(watch=False)
+            list_fn = batchV1Api.list_job_for_all_namespaces
         elif resource == "cronjob":
-            ret = batchV2Api.list_cron_job_for_all_namespaces(watch=False)
+            list_fn = batchV2Api.list_cron_job_for_all_namespaces
         elif resource == "scheduledjob":
-            ret = batchV2Api.list_scheduled_job_for_all_namespaces(watch=False)
+            list_fn = batchV2Api.list_scheduled_job_for_all_namespaces
+
+        if list_fn is None:
+            return None
+        if self.transport == "protobuf" and resource in RESOURCE_PATHS:
+            list_fn = functools.partial(list_metadata, api_client, RESOURCE_PATHS[resource])
+
+        # while the API server is unreachable complete from the last known data
+        breaker = self.get_breaker(context)
+        if not breaker.allow():
+            logger.debug("not listing %s, API server of context %r is offline", resource, context)
+            self.request_stats.incr("short_circuited")
+            return self.get_stale_resources(context, resource)
+        try:
+            ret = self.call_api(list_fn)
+        except ApiException as e:
+            logger.warning("listing %s in context %r failed: %s %s", resource, context, e.status, e.reason)
+            if not e.status or is_retryable(e.status):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            return self.get_stale_resources(context, resource)
+        except ValueError:
+            # the server answered, but with a body that couldn't be decoded
+            logger.warning("could not decode %s list from context %r", resource, context, exc_info=True)
+            breaker.record_success()
+            return self.get_stale_resources(context, resource)
+        except Exception:
+            logger.warning("listing %s in context %r failed", resource, context, exc_info=True)
+            breaker.record_failure()
+            return self.get_stale_resources(context, resource)
+        if ret is None:
+            logger.debug("listing %s in context %r was throttled", resource, context)
+            breaker.release()
+            return self.get_stale_resources(context, resource)
+        breaker.record_success()
 
-        if ret:
-            for i in ret.items:
-                if namespace == "all" or not namespaced_resource:
-                    resources.append((i.metadata.name, i.metadata.namespace))
-                elif namespace == i.metadata.namespace:
-                    resources.append((i.metadata.name, i.metadata.namespace))
-            return resources
-        return None
+        items = [(i.metadata.name, i.metadata.namespace) for i in ret.items]
+        with self.cache_lock:
+            if generation == self.cache_generation:
+                self.resource_cache[(context, resource)] = (time.time(), items)
+        return items
 
+    def call_api(self, list_fn):
+        for attempt in range(self.max_retries + 1):
+            if not self.rate_limiter.acquire(timeout=self.rate_limit_wait):
+                self.request_stats.incr("throttled")
+                return None
+            self.request_stats.incr("issued")
+            try:
+                return list_fn(watch=False, _request_timeout=(self.connect_timeout, self.read_timeout))
+            except ApiException as e:
+                if attempt == self.max_retries or not is_retryable(e.status):
+                    raise
+                retry_after = e.headers.get("Retry-After") if e.headers else None
+                time.sleep(backoff_delay(attempt, retry_after))
+                self.request_stats.incr("retried")
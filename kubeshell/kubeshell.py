@@ -1,6 +1,6 @@
 from __future__ import print_function, absolute_import, unicode_literals
 
-from prompt_toolkit import prompt
+from prompt_toolkit.shortcuts import create_prompt_application, run_application
 from prompt_toolkit.history import FileHistory
 from prompt_toolkit.auto_suggest import AutoSuggestFromHistory
 from prompt_toolkit.key_binding.defaults import load_key_bindings_for_prompt
@@ -10,6 +10,8 @@ from kubeshell.style import StyleFactory
 from kubeshell.completer import KubectlCompleter
 from kubeshell.lexer import KubectlLexer
 from kubeshell.toolbar import Toolbar
+from kubeshell.warmup import CacheWarmer
+from kubeshell.replay import KeystrokeRecorder
 
 import os
 import click
@@ -22,6 +24,7 @@ inline_help = True
 
 registry = load_key_bindings_for_prompt()
 completer = KubectlCompleter()
+warmer = CacheWarmer(completer)
 
 
 class KubeConfig(object):
@@ -94,7 +97,10 @@ class Kubeshell(object):
         self.history = FileHistory(os.path.join(shell_dir, "history"))
         if not os.path.exists(shell_dir):
             os.makedirs(shell_dir)
-        self.toolbar = Toolbar(self.get_cluster_name, self.get_namespace, self.get_user, self.get_inline_help)
+        record_path = os.environ.get("KUBE_SHELL_RECORD")
+        self.recorder = KeystrokeRecorder(os.path.expanduser(record_path)) if record_path else None
+        self.toolbar = Toolbar(self.get_cluster_name, self.get_namespace, self.get_user, self.get_inline_help,
+                               self.get_warmup_status, self.get_api_stats, self.get_offline)
 
     @registry.add_binding(Keys.F4)
     def _(event):
@@ -104,6 +110,8 @@ class Kubeshell(object):
         except Exception as e:
             # TODO: log errors to log file
             pass
+        completer.set_context(KubeConfig.current_context_name)
+        warmer.start(on_progress=event.cli.invalidate)
 
     @registry.add_binding(Keys.F5)
     def _(event):
@@ -136,14 +144,47 @@ class Kubeshell(object):
     def get_inline_help(self):
         return inline_help
 
-    def run_cli(self):
+    def get_warmup_status(self):
+        return warmer.status()
+
+    def get_api_stats(self):
+        stats = completer.request_stats
+        if not stats.issued:
+            return ""
+        return "{0} (saved {1})".format(stats.issued, stats.saved())
+
+    def get_offline(self):
+        return completer.is_offline()
+
+    def create_application(self):
 
         def get_title():
             return "kube-shell"
 
+        return create_prompt_application('kube-shell> ',
+                                         history=self.history,
+                                         auto_suggest=AutoSuggestFromHistory(),
+                                         style=StyleFactory("vim").style,
+                                         lexer=KubectlLexer,
+                                         get_title=get_title,
+                                         enable_history_search=False,
+                                         get_bottom_toolbar_tokens=self.toolbar.handler,
+                                         vi_mode=True,
+                                         key_bindings_registry=registry,
+                                         completer=completer)
+
+    def run_cli(self):
+
         if not os.path.exists(os.path.expanduser("~/.kube/config")):
             click.secho('Kube-shell uses ~/.kube/config for server side completion. Could not find ~/.kube/config. '
                     'Server side completion functionality may not work.', fg='red', blink=True, bold=True)
+        try:
+            KubeConfig.parse_kubeconfig()
+        except:
+            # TODO: log errors to log file
+            pass
+        completer.set_context(KubeConfig.current_context_name)
+        warmer.start()
         while True:
             global inline_help
             try:
@@ -152,19 +193,14 @@ class Kubeshell(object):
                 # TODO: log errors to log file
                 pass
             completer.set_namespace(self.namespace)
+            completer.set_context(KubeConfig.current_context_name)
+
+            application = self.create_application()
+            if self.recorder is not None:
+                self.recorder.attach(application)
 
             try:
-                user_input = prompt('kube-shell> ',
-                            history=self.history,
-                            auto_suggest=AutoSuggestFromHistory(),
-                            style=StyleFactory("vim").style,
-                            lexer=KubectlLexer,
-                            get_title=get_title,
-                            enable_history_search=False,
-                            get_bottom_toolbar_tokens=self.toolbar.handler,
-                            vi_mode=True,
-                            key_bindings_registry=registry,
-                            completer=completer)
+                user_input = run_application(application, refresh_interval=0.5 if warmer.running() else 0)
             except (EOFError, KeyboardInterrupt):
                 sys.exit()
 
@@ -173,12 +209,49 @@ class Kubeshell(object):
             elif user_input == "exit":
                 sys.exit()
 
-            # if execute shell command then strip "!"
-            if user_input.startswith("!"):
-                user_input = user_input[1:]
-
             if user_input:
-                if '-o' in user_input and 'json' in user_input:
-                    user_input += ' | pygmentize -l json'
-                p = subprocess.Popen(user_input, shell=True)
-                p.communicate()
+                self.execute(user_input)
+                # the command may have created or deleted resources
+                completer.invalidate_cache()
+
+    def execute(self, user_input, capture=False, highlight=True):
+        """Run a command line, returning its exit status and, if `capture`, its output.
+
+        With `highlight`, JSON output is colored by pygmentize; the exit
+        status is still the command's own.
+        """
+        # if execute shell command then strip "!"
+        if user_input.startswith("!"):
+            user_input = user_input[1:]
+
+        if not user_input:
+            return 0, None
+        stdout = subprocess.PIPE if capture else None
+        stderr = subprocess.STDOUT if capture else None
+        if highlight and '-o' in user_input and 'json' in user_input:
+            p = subprocess.Popen(user_input, shell=True, stdout=subprocess.PIPE, stderr=stderr)
+            try:
+                pygmentize = subprocess.Popen(['pygmentize', '-l', 'json'], stdin=p.stdout, stdout=stdout)
+            except OSError:
+                # pygmentize isn't on PATH, e.g. when installed with pipx
+                output = self.copy_output(p.stdout, capture)
+            else:
+                output, _ = pygmentize.communicate()
+            finally:
+                # let pygmentize see EOF when the command exits
+                p.stdout.close()
+                p.wait()
+        else:
+            p = subprocess.Popen(user_input, shell=True, stdout=stdout, stderr=stderr)
+            output, _ = p.communicate()
+        return p.returncode, output
+
+    def copy_output(self, pipe, capture):
+        """Read `pipe` to the end, returning its content if `capture` or else writing it to stdout."""
+        if capture:
+            return pipe.read()
+        out = getattr(sys.stdout, "buffer", sys.stdout)
+        for chunk in iter(lambda: os.read(pipe.fileno(), 4096), b""):
+            out.write(chunk)
+            out.flush()
+        return None
@@ -4,9 +4,28 @@
 
 from __future__ import print_function, absolute_import, unicode_literals
 from kubeshell.kubeshell import Kubeshell
+from kubeshell.batch import BatchRunner
 
-def cli():
+import click
+import logging
+import os
+import sys
+
+@click.command()
+@click.option('-f', '--file', 'script', type=click.File('r'),
+              help='Run the commands in a script ("-" for stdin) instead of starting the shell.')
+@click.option('-p', '--parallel', default=1, type=click.IntRange(1),
+              help='Number of independent script lines run at the same time.')
+def cli(script, parallel):
     kube_shell= Kubeshell()
+    # errors kube-shell recovers from, like an unreachable API server, go
+    # to a log file rather than the prompt
+    logging.basicConfig(filename=os.path.expanduser("~/.kube/shell/kube-shell.log"), level=logging.WARNING,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    if script is None and not sys.stdin.isatty():
+        script = click.get_text_stream('stdin')
+    if script is not None:
+        sys.exit(BatchRunner(kube_shell, parallel).run(script))
     kube_shell.run_cli()
 
 if __name__ == "__main__":
@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Record kube-shell keystroke sessions and replay them headlessly.
+
+Run kube-shell with KUBE_SHELL_RECORD=<file> to record every keystroke, then
+
+    python -m kubeshell.replay <file>
+
+replays the session through the full prompt pipeline (lexer, toolbar,
+completer, auto suggestions) against a stand-in API server and reports how
+long each keystroke took to render, including the completions and
+suggestions it started in the background.
+"""
+
+from __future__ import print_function, absolute_import, unicode_literals
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from prompt_toolkit.history import InMemoryHistory
+from prompt_toolkit.input import PipeInput
+from prompt_toolkit.interface import CommandLineInterface
+from prompt_toolkit.keys import Keys
+from prompt_toolkit.output import DummyOutput
+from prompt_toolkit.shortcuts import create_eventloop
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+from kubeshell.transport import RESOURCE_PATHS
+
+
+# keystrokes that accept the current line
+ENTER_KEYS = ("\r", "\n")
+
+# seconds between checks for a render that may have been lost while
+# waiting for a keystroke to finish
+SYNC_INTERVAL = 0.05
+
+# resources served by `StandInApiServer` unless told otherwise
+DEFAULT_FIXTURES = {
+    "namespace": [("default", None), ("kube-system", None), ("team-a", None)],
+    "node": [("node-{0}".format(i), None) for i in range(3)],
+    "pod": [("frontend-{0}".format(i), "default") for i in range(20)] +
+           [("kube-dns-{0}".format(i), "kube-system") for i in range(2)],
+    "service": [("frontend", "default"), ("kube-dns", "kube-system")],
+    "deployment": [("frontend", "default"), ("kube-dns", "kube-system")],
+}
+
+
+class KeystrokeRecorder(object):
+    """Append every keystroke typed at the prompt to a JSON lines file.
+
+    Each line holds the raw input `data` of a key press and the `delay` in
+    seconds since the previous one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.last_keystroke = None
+        self.lock = threading.Lock()
+
+    def attach(self, application):
+        on_start = application.on_start
+
+        def start(cli):
+            on_start(cli)
+            self._wrap_input_processor(cli.input_processor)
+
+        application.on_start = start
+
+    def _wrap_input_processor(self, input_processor):
+        feed = input_processor.feed
+
+        def recording_feed(key_press):
+            if key_press.key != Keys.CPRResponse:
+                self.record(key_press.data)
+            feed(key_press)
+
+        input_processor.feed = recording_feed
+
+    def record(self, data):
+        with self.lock:
+            now = time.time()
+            delay = 0 if self.last_keystroke is None else now - self.last_keystroke
+            self.last_keystroke = now
+            with open(self.path, "a") as fd:
+                fd.write(json.dumps({"delay": round(delay, 4), "data": data}) + "\n")
+
+
+def load_session(path):
+    """Return the recorded keystrokes in `path` as a list of `(delay, data)`."""
+    keystrokes = []
+    with open(path) as fd:
+        for line in fd:
+            if line.strip():
+                keystroke = json.loads(line)
+                keystrokes.append((keystroke["delay"], keystroke["data"]))
+    return keystrokes
+
+
+def split_lines(keystrokes):
+    """Group keystrokes into the prompt lines they were typed at."""
+    lines = [[]]
+    for keystroke in keystrokes:
+        lines[-1].append(keystroke)
+        if keystroke[1] in ENTER_KEYS:
+            lines.append([])
+    return [line for line in lines if line]
+
+
+class LatencyReport(object):
+    """Distribution of per-keystroke render latencies, in seconds."""
+
+    def __init__(self, latencies, timeouts=0):
+        self.latencies = sorted(latencies)
+        self.timeouts = timeouts
+
+    def percentile(self, p):
+        if not self.latencies:
+            return 0.0
+        index = min(len(self.latencies) - 1, int(round(p / 100.0 * (len(self.latencies) - 1))))
+        return self.latencies[index]
+
+    def summary(self):
+        fmt = "{0} keystrokes, p50 {1:.1f}ms, p90 {2:.1f}ms, p99 {3:.1f}ms, max {4:.1f}ms, {5} timed out"
+        return fmt.format(len(self.latencies), self.percentile(50) * 1000, self.percentile(90) * 1000,
+                          self.percentile(99) * 1000, self.percentile(100) * 1000, self.timeouts)
+
+
+class BackgroundWork(object):
+    """Track the completion and suggestion threads started by an event loop.
+
+    prompt_toolkit computes completions and suggestions with
+    `run_in_executor` and applies the result with `call_from_executor`. A
+    job counts as pending from the moment it is scheduled until the event
+    loop has run everything the job queued, and `on_idle` is called from
+    the event loop once no job is pending.
+    """
+
+    def __init__(self, eventloop, on_idle):
+        self.eventloop = eventloop
+        self.on_idle = on_idle
+        # `scheduled` and `applied` are only changed by the event loop thread
+        self.scheduled = 0
+        self.finished = 0
+        self.applied = 0
+        self.lock = threading.Lock()
+        run_in_executor = eventloop.run_in_executor
+
+        def tracked_run_in_executor(callback):
+            # called from the event loop thread, before the render of the
+            # key press that scheduled the job
+            self.scheduled += 1
+
+            def run():
+                try:
+                    callback()
+                finally:
+                    with self.lock:
+                        self.finished += 1
+                    self.sync()
+
+            run_in_executor(run)
+
+        eventloop.run_in_executor = tracked_run_in_executor
+
+    @property
+    def pending(self):
+        return self.scheduled - self.applied
+
+    def sync(self):
+        """Mark the jobs finished so far as applied once the event loop gets here.
+
+        The event loop runs its queued calls in order, so by then the results
+        the jobs queued are applied. Safe to call again: the posix event loop
+        of prompt_toolkit 1.0 can drop a call queued from another thread
+        while it is running the previous batch.
+        """
+        with self.lock:
+            finished = self.finished
+        self.eventloop.call_from_executor(lambda: self._apply(finished))
+
+    def _apply(self, finished):
+        self.applied = max(self.applied, finished)
+        if not self.pending:
+            self.on_idle()
+
+
+def replay(keystrokes, shell, speed=0, timeout=5.0):
+    """Feed `keystrokes` to the prompt of `shell` and time each keystroke.
+
+    A keystroke's latency runs until the first render after it was
+    processed and all completion and suggestion work it started has been
+    applied.
+
+    :type shell: Kubeshell
+    :param shell: Shell whose application is built for every prompt line.
+
+    :type speed: float
+    :param speed: Replay the recorded delays this many times faster, 0 to
+        send each keystroke as soon as the previous one has been rendered.
+
+    """
+    latencies = []
+    timeouts = [0]
+
+    for line in split_lines(keystrokes):
+        pipe_input = PipeInput()
+        eventloop = create_eventloop()
+        cli = CommandLineInterface(application=shell.create_application(), eventloop=eventloop,
+                                   input=pipe_input, output=DummyOutput())
+        started = threading.Event()
+        rendered = threading.Event()
+        processed = [False]
+        rendered_at = [None]
+
+        def after_key_press(_):
+            processed[0] = True
+
+        def on_render(_):
+            started.set()
+            if processed[0] and not background.pending:
+                processed[0] = False
+                rendered_at[0] = time.time()
+                rendered.set()
+
+        def on_stop(_):
+            rendered_at[0] = time.time()
+            rendered.set()
+
+        # render once more when the last background job is done, so its
+        # result is on screen before the keystroke counts as finished. This
+        # runs in the event loop, so render directly rather than through
+        # `invalidate`, which does nothing while an earlier redraw is queued
+        background = BackgroundWork(eventloop, lambda cli=cli: cli._redraw())
+        cli.input_processor.afterKeyPress += after_key_press
+        cli.on_render += on_render
+        cli.on_stop += on_stop
+
+        def feed(line=line, cli=cli, pipe_input=pipe_input, started=started, rendered=rendered,
+                 rendered_at=rendered_at, background=background):
+            started.wait(timeout)
+            for delay, data in line:
+                if speed:
+                    time.sleep(delay / speed)
+                rendered.clear()
+                sent_at = time.time()
+                pipe_input.send_text(data)
+                deadline = sent_at + timeout
+                while not rendered.wait(SYNC_INTERVAL) and time.time() < deadline:
+                    # recover from a dropped call, see `BackgroundWork.sync`
+                    background.sync()
+                if rendered.is_set():
+                    latencies.append(rendered_at[0] - sent_at)
+                else:
+                    timeouts[0] += 1
+                if cli.is_done:
+                    return
+            # the recording ended without accepting this line
+            deadline = time.time() + timeout
+            while not cli.is_done and time.time() < deadline:
+                cli.eventloop.call_from_executor(lambda: cli.set_return_value(None))
+                time.sleep(SYNC_INTERVAL)
+
+        feeder = threading.Thread(target=feed)
+        feeder.daemon = True
+        feeder.start()
+        try:
+            cli.run()
+        except (EOFError, KeyboardInterrupt):
+            break
+        finally:
+            feeder.join(timeout)
+            eventloop.close()
+            pipe_input.close()
+
+    return LatencyReport(latencies, timeouts[0])
+
+
+class StandInApiServer(object):
+    """Local HTTP server answering list calls with fixed resources.
+
+    Use as a context manager; `kubeconfig` is the path of a kubeconfig
+    pointing at the server while it runs.
+
+    :type fixtures: dict
+    :param fixtures: Maps resource kinds to lists of `(name, namespace)`.
+
+    """
+
+    def __init__(self, fixtures=None):
+        self.fixtures = DEFAULT_FIXTURES if fixtures is None else fixtures
+        self.kubeconfig = None
+        self.server = None
+        self.tmpdir = None
+
+    def __enter__(self):
+        lists = {}
+        for resource, path in RESOURCE_PATHS.items():
+            items = [{"metadata": {"name": name, "namespace": namespace}}
+                     for name, namespace in self.fixtures.get(resource, [])]
+            lists[path] = json.dumps({"kind": "List", "apiVersion": "v1", "metadata": {}, "items": items})
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                body = lists.get(self.path.split("?")[0])
+                if body is None:
+                    self.send_error(404)
+                    return
+                body = body.encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.tmpdir = tempfile.mkdtemp()
+        self.kubeconfig = os.path.join(self.tmpdir, "config")
+        with open(self.kubeconfig, "w") as fd:
+            json.dump({
+                "apiVersion": "v1",
+                "kind": "Config",
+                "clusters": [{"name": "replay", "cluster": {"server": "http://127.0.0.1:{0}".format(
+                    self.server.server_address[1])}}],
+                "users": [{"name": "replay", "user": {"token": "replay"}}],
+                "contexts": [{"name": "replay", "context": {"cluster": "replay", "user": "replay"}}],
+                "current-context": "replay",
+            }, fd)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.tmpdir)
+
+
+def replay_session(keystrokes, speed=0, fixtures=None):
+    """Replay `keystrokes` through a `Kubeshell` backed by a stand-in API server."""
+    from kubeshell.kubeshell import Kubeshell, completer
+
+    shell = Kubeshell()
+    # don't let the user's own history change what gets suggested
+    shell.history = InMemoryHistory()
+    kubeconfig = completer.kubeconfig
+    with StandInApiServer(fixtures) as server:
+        completer.kubeconfig = server.kubeconfig
+        completer.invalidate_cache()
+        try:
+            return replay(keystrokes, shell, speed=speed)
+        finally:
+            completer.kubeconfig = kubeconfig
+            completer.invalidate_cache()
+
+
+def main():
+    if len(sys.argv) < 2:
+        sys.exit("usage: python -m kubeshell.replay <session file> [speed]")
+    speed = float(sys.argv[2]) if len(sys.argv) > 2 else 0
+    report = replay_session(load_session(sys.argv[1]), speed=speed)
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from __future__ import unicode_literals
+import json
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+from prompt_toolkit.completion import CompleteEvent
+from prompt_toolkit.document import Document
+
+from kubeshell.completer import KubectlCompleter
+
+
+def unused_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+class OfflineCompletionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        kubeconfig = os.path.join(self.tmpdir, "config")
+        with open(kubeconfig, "w") as fd:
+            json.dump({
+                "apiVersion": "v1",
+                "kind": "Config",
+                "clusters": [{"name": "dead", "cluster": {"server": "http://127.0.0.1:{0}".format(unused_port())}}],
+                "users": [{"name": "dead", "user": {"token": "dead"}}],
+                "contexts": [{"name": "dead", "context": {"cluster": "dead", "user": "dead"}}],
+                "current-context": "dead",
+            }, fd)
+        self.completer = KubectlCompleter()
+        self.completer.kubeconfig = kubeconfig
+        self.completer.set_context("dead")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def complete(self, text):
+        return [c.text for c in self.completer.get_completions(Document(text), CompleteEvent())]
+
+    def test_unreachable_server_without_cache(self):
+        self.assertEqual(self.complete("kubectl get pods --namespace "), [])
+        self.assertEqual(self.completer.get_resources("pod"), [])
+
+    def test_open_breaker_without_cache(self):
+        breaker = self.completer.get_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertTrue(self.completer.is_offline())
+        self.assertEqual(self.complete("kubectl get pods --namespace "), [])
+        self.assertEqual(self.completer.request_stats.short_circuited, 1)
+
+    def test_open_breaker_completes_from_stale_cache(self):
+        self.completer.resource_cache[("dead", "namespace")] = (0, [("default", None), ("team-a", None)])
+        breaker = self.completer.get_breaker()
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(self.complete("kubectl get pods --namespace "), ["default", "team-a"])
+
+    def test_decode_error_does_not_open_breaker(self):
+        def undecodable(list_fn):
+            raise ValueError("response is not a kubernetes protobuf object")
+
+        self.completer.call_api = undecodable
+        for _ in range(3):
+            self.assertEqual(self.completer.get_resources("pod"), [])
+        self.assertFalse(self.completer.is_offline())
+
+    def test_unknown_kind(self):
+        self.assertIsNone(self.completer.get_resources("nosuchkind"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+from __future__ import unicode_literals
+import os
+import shutil
+import tempfile
+import unittest
+
+from kubeshell.kubeshell import Kubeshell
+
+JSON_COMMAND = "echo '{\"kind\": \"List\"}' -o json; exit 3"
+
+
+class ExecuteTest(unittest.TestCase):
+
+    def setUp(self):
+        self.shell = Kubeshell()
+
+    def test_batch_output_is_not_highlighted(self):
+        status, output = self.shell.execute(JSON_COMMAND, capture=True, highlight=False)
+        self.assertEqual(status, 3)
+        self.assertEqual(output, b'{"kind": "List"} -o json\n')
+
+    def test_highlight_keeps_command_status(self):
+        status, output = self.shell.execute(JSON_COMMAND, capture=True)
+        self.assertEqual(status, 3)
+        self.assertIn(b'"kind"', output)
+
+    def test_highlight_without_pygmentize(self):
+        path = os.environ.get("PATH", "")
+        empty = tempfile.mkdtemp()
+        os.environ["PATH"] = empty
+        try:
+            status, output = self.shell.execute(JSON_COMMAND, capture=True)
+        finally:
+            os.environ["PATH"] = path
+            shutil.rmtree(empty)
+        self.assertEqual(status, 3)
+        self.assertEqual(output, b'{"kind": "List"} -o json\n')
+
+if __name__ == "__main__":
+    unittest.main()
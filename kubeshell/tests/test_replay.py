@@ -0,0 +1,30 @@
+from __future__ import unicode_literals
+import os
+import unittest
+
+from kubeshell.replay import load_session, replay_session
+
+SESSION = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'session.jsonl')
+
+# per-keystroke latency budgets, in milliseconds. The tail depends too much
+# on how busy the machine is to be checked by default; set
+# KUBE_SHELL_REPLAY_MAX_P99_MS to check it as well.
+MAX_P50_MS = float(os.environ.get('KUBE_SHELL_REPLAY_MAX_P50_MS', 50))
+MAX_P90_MS = float(os.environ.get('KUBE_SHELL_REPLAY_MAX_P90_MS', 100))
+MAX_P99_MS = os.environ.get('KUBE_SHELL_REPLAY_MAX_P99_MS')
+
+
+class ReplayTest(unittest.TestCase):
+
+    def test_replay_latency(self):
+        keystrokes = load_session(SESSION)
+        report = replay_session(keystrokes)
+        self.assertEqual(report.timeouts, 0, report.summary())
+        self.assertEqual(len(report.latencies), len(keystrokes), report.summary())
+        self.assertLessEqual(report.percentile(50) * 1000, MAX_P50_MS, report.summary())
+        self.assertLessEqual(report.percentile(90) * 1000, MAX_P90_MS, report.summary())
+        if MAX_P99_MS:
+            self.assertLessEqual(report.percentile(99) * 1000, float(MAX_P99_MS), report.summary())
+
+if __name__ == "__main__":
+    unittest.main()
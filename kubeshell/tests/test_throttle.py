@@ -0,0 +1,154 @@
+from __future__ import unicode_literals
+import threading
+import time
+import unittest
+
+from kubeshell.throttle import CircuitBreaker, SingleFlight, TokenBucket
+
+
+def in_thread(fn):
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fn()))
+    thread.start()
+    thread.join()
+    return result[0]
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_then_refill(self):
+        bucket = TokenBucket(qps=20, burst=3)
+        self.assertTrue(all(bucket.acquire(timeout=0) for _ in range(3)))
+        self.assertFalse(bucket.acquire(timeout=0))
+        started = time.time()
+        self.assertTrue(bucket.acquire(timeout=1))
+        self.assertGreater(time.time() - started, 0.02)
+
+    def test_zero_qps_never_refills(self):
+        bucket = TokenBucket(qps=0, burst=1)
+        self.assertTrue(bucket.acquire())
+        self.assertFalse(bucket.acquire())
+
+
+class SingleFlightTest(unittest.TestCase):
+
+    def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fetch():
+            calls.append(1)
+            release.wait()
+            return "pods"
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flight.do("pod", fetch))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results), [("pods", False)] + [("pods", True)] * 4)
+        self.assertEqual(flight.calls, {})
+
+    def test_error_reaches_waiters(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        errors = []
+
+        def fetch():
+            release.wait()
+            raise ValueError("unreachable")
+
+        def call():
+            try:
+                flight.do("pod", fetch)
+            except ValueError as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(errors), 3)
+        self.assertEqual(flight.do("pod", lambda: "pods"), ("pods", False))
+
+
+class CircuitBreakerTest(unittest.TestCase):
+
+    def open_breaker(self, backoff=0.05, max_backoff=0.3):
+        breaker = CircuitBreaker(failure_threshold=2, backoff=backoff, max_backoff=max_backoff)
+        breaker.record_failure()
+        self.assertFalse(breaker.is_open())
+        breaker.record_failure()
+        self.assertTrue(breaker.is_open())
+        return breaker
+
+    def test_opens_after_threshold(self):
+        breaker = self.open_breaker()
+        self.assertFalse(breaker.allow())
+
+    def test_success_resets_failure_count(self):
+        breaker = CircuitBreaker(failure_threshold=2)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertFalse(breaker.is_open())
+
+    def test_late_failures_do_not_grow_backoff(self):
+        breaker = self.open_breaker()
+        for _ in range(4):
+            breaker.record_failure()
+        self.assertEqual(breaker.open_for, 0.05)
+
+    def test_half_open_admits_one_trial(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertFalse(in_thread(breaker.allow))
+
+    def test_failed_trial_doubles_backoff(self):
+        breaker = self.open_breaker()
+        for open_for in (0.1, 0.2, 0.3, 0.3):
+            time.sleep(breaker.open_for + 0.01)
+            self.assertTrue(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(breaker.open_for, open_for)
+            self.assertFalse(breaker.allow())
+
+    def test_failure_outside_trial_is_not_the_trial(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        in_thread(breaker.record_failure)
+        self.assertEqual(breaker.open_for, 0.05)
+        breaker.record_failure()
+        self.assertEqual(breaker.open_for, 0.1)
+
+    def test_successful_trial_closes(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertFalse(breaker.is_open())
+        self.assertTrue(in_thread(breaker.allow))
+        self.assertEqual(breaker.open_for, 0.05)
+
+    def test_released_trial_lets_another_through(self):
+        breaker = self.open_breaker()
+        time.sleep(0.06)
+        self.assertTrue(breaker.allow())
+        breaker.release()
+        self.assertTrue(in_thread(breaker.allow))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+from __future__ import unicode_literals
+import json
+import os
+import sys
+import unittest
+
+from kubeshell import transport
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'misc'))
+from bench_transport import encode_list, make_pod
+
+
+def make_node(name):
+    return {"metadata": {"name": name, "labels": {"kubernetes.io/hostname": name}}}
+
+
+class ProtobufDecodeTest(unittest.TestCase):
+
+    def test_namespaced_items(self):
+        pods = [make_pod(i) for i in range(3)]
+        items = transport.decode_list(encode_list(pods), transport.PROTOBUF_CONTENT_TYPE)
+        self.assertEqual([(i.metadata.name, i.metadata.namespace) for i in items],
+                         [(p["metadata"]["name"], p["metadata"]["namespace"]) for p in pods])
+        self.assertEqual(items[1].metadata.labels, pods[1]["metadata"]["labels"])
+
+    def test_cluster_scoped_items(self):
+        items = transport.decode_protobuf_list(encode_list([make_node("node-a"), make_node("node-b")], "NodeList"))
+        self.assertEqual([i.metadata.name for i in items], ["node-a", "node-b"])
+        self.assertEqual([i.metadata.namespace for i in items], [None, None])
+        self.assertEqual(items[0].metadata.labels, {"kubernetes.io/hostname": "node-a"})
+
+    def test_empty_list(self):
+        self.assertEqual(transport.decode_protobuf_list(encode_list([])), [])
+
+    def test_not_protobuf(self):
+        self.assertRaises(ValueError, transport.decode_protobuf_list, b'{"items": []}')
+
+    def test_json_fallback(self):
+        body = json.dumps({"kind": "NodeList", "items": [make_node("node-a"), make_pod(7)]}).encode("utf-8")
+        items = transport.decode_list(body, "application/json")
+        self.assertEqual([(i.metadata.name, i.metadata.namespace) for i in items],
+                         [("node-a", None), (make_pod(7)["metadata"]["name"], "team-7")])
+        self.assertEqual(items[0].metadata.labels, {"kubernetes.io/hostname": "node-a"})
+
+if __name__ == "__main__":
+    unittest.main()
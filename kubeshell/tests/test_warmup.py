@@ -0,0 +1,166 @@
+from __future__ import unicode_literals
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from kubeshell.completer import KubectlCompleter
+from kubeshell.warmup import CacheWarmer
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.01)
+
+
+class FakeCompleter(object):
+    """Completer whose list calls block until `release` is set."""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.started = []
+        self.fetched = []
+        self.invalidated = 0
+        self.lock = threading.Lock()
+
+    def invalidate_cache(self):
+        self.invalidated += 1
+
+    def get_resources(self, resource):
+        with self.lock:
+            self.started.append(resource)
+        self.release.wait()
+        with self.lock:
+            self.fetched.append(resource)
+
+
+class CacheWarmerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.completer = FakeCompleter()
+
+    def tearDown(self):
+        # let the daemon workers drain whatever is left
+        self.completer.release.set()
+
+    def test_warms_every_kind(self):
+        progress = []
+        warmer = CacheWarmer(self.completer, resources=("pod", "service", "node"), max_workers=2)
+        self.assertFalse(warmer.running())
+        self.assertEqual(warmer.status(), "")
+        warmer.start(on_progress=lambda: progress.append(1))
+        self.assertTrue(warmer.running())
+        self.assertEqual(warmer.status(), "0/3")
+        self.assertEqual(self.completer.invalidated, 1)
+        self.completer.release.set()
+        wait_for(lambda: not warmer.running())
+        self.assertEqual(sorted(self.completer.fetched), ["node", "pod", "service"])
+        self.assertEqual(len(progress), 3)
+        self.assertEqual(warmer.status(), "")
+
+    def test_new_start_drops_queued_kinds(self):
+        warmer = CacheWarmer(self.completer, resources=("pod", "service", "node"), max_workers=1)
+        warmer.start()
+        wait_for(lambda: self.completer.started)
+        # "pod" of the first run is in flight, "service" and "node" are queued
+        warmer.start()
+        self.assertEqual(warmer.status(), "0/3")
+        self.completer.release.set()
+        wait_for(lambda: not warmer.running())
+        self.assertEqual(self.completer.fetched, ["pod", "pod", "service", "node"])
+
+    def test_cancel(self):
+        warmer = CacheWarmer(self.completer, resources=("pod", "service"), max_workers=1)
+        warmer.start()
+        wait_for(lambda: self.completer.started)
+        warmer.cancel()
+        self.assertFalse(warmer.running())
+        self.assertEqual(warmer.status(), "")
+        self.completer.release.set()
+        time.sleep(0.05)
+        self.assertEqual(self.completer.fetched, ["pod"])
+
+    def test_repeated_starts_keep_worker_count(self):
+        warmer = CacheWarmer(self.completer, resources=("pod", "service", "node"), max_workers=2)
+        for _ in range(5):
+            warmer.start()
+            time.sleep(0.01)
+        self.assertEqual(len(warmer.workers), 2)
+        self.assertEqual(len(self.completer.started), 2)
+        self.completer.release.set()
+        wait_for(lambda: not warmer.running())
+        self.assertEqual(len(warmer.workers), 2)
+        self.assertTrue(all(worker.is_alive() for worker in warmer.workers))
+
+
+class FakeList(object):
+
+    def __init__(self, names):
+        self.items = [FakeItem(name) for name in names]
+
+
+class FakeItem(object):
+
+    def __init__(self, name):
+        self.metadata = self
+        self.name = name
+        self.namespace = "default"
+
+
+class CacheGenerationTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        kubeconfig = os.path.join(self.tmpdir, "config")
+        with open(kubeconfig, "w") as fd:
+            json.dump({
+                "apiVersion": "v1",
+                "kind": "Config",
+                "clusters": [{"name": "test", "cluster": {"server": "http://127.0.0.1:1"}}],
+                "users": [{"name": "test", "user": {"token": "test"}}],
+                "contexts": [{"name": "test", "context": {"cluster": "test", "user": "test"}}],
+                "current-context": "test",
+            }, fd)
+        self.completer = KubectlCompleter()
+        self.completer.kubeconfig = kubeconfig
+        self.completer.set_context("test")
+        self.release = threading.Event()
+        self.calls = []
+
+        def call_api(list_fn):
+            self.calls.append(list_fn)
+            self.release.wait()
+            return FakeList(["frontend"])
+
+        self.completer.call_api = call_api
+
+    def tearDown(self):
+        self.release.set()
+        shutil.rmtree(self.tmpdir)
+
+    def test_result_stored(self):
+        self.release.set()
+        self.assertEqual(self.completer.get_resources("pod"), [("frontend", "default")])
+        self.assertEqual(self.completer.get_cached_resources("pod"), [("frontend", "default")])
+
+    def test_result_after_invalidate_not_stored(self):
+        results = []
+        fetch = threading.Thread(target=lambda: results.append(self.completer.get_resources("pod")))
+        fetch.start()
+        wait_for(lambda: self.calls)
+        self.completer.invalidate_cache()
+        self.release.set()
+        fetch.join()
+        # the caller still gets its answer, but it isn't cached for the new generation
+        self.assertEqual(results, [[("frontend", "default")]])
+        self.assertIsNone(self.completer.get_cached_resources("pod"))
+        self.assertEqual(self.completer.resource_cache, {})
+
+if __name__ == "__main__":
+    unittest.main()
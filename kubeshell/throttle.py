@@ -0,0 +1,191 @@
+from __future__ import print_function, absolute_import, unicode_literals
+
+import random
+import threading
+import time
+
+
+class TokenBucket(object):
+    """Client side QPS limiter for requests sent to the API server.
+
+    :type qps: float
+    :param qps: Rate at which tokens are refilled, per second.
+
+    :type burst: int
+    :param burst: Maximum number of tokens that can be spent at once.
+
+    """
+
+    def __init__(self, qps, burst):
+        self.qps = float(qps)
+        self.burst = max(1, int(burst))
+        self.tokens = float(self.burst)
+        self.last_refill = time.time()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.time()
+        self.tokens = min(self.burst, self.tokens + (now - self.last_refill) * self.qps)
+        self.last_refill = now
+
+    def acquire(self, timeout=None):
+        """Take a token, waiting at most `timeout` seconds for one to free up."""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                if self.qps <= 0:
+                    return False
+                wait = (1 - self.tokens) / self.qps
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+            time.sleep(wait)
+
+
+class SingleFlight(object):
+    """Share the result of a call among callers asking for the same key while it runs."""
+
+    def __init__(self):
+        self.calls = {}
+        self.lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return `(result, shared)`, where `shared` is True if another caller made the call."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = self.calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class _Call(object):
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class CircuitBreaker(object):
+    """Stop calling an API server that keeps failing for a growing backoff window.
+
+    Once the window has passed the breaker is half-open: a single trial call
+    is let through and every other call is still refused until it finishes.
+
+    :type failure_threshold: int
+    :param failure_threshold: Consecutive failures after which the breaker opens.
+
+    :type backoff: float
+    :param backoff: Seconds the breaker stays open before a trial call is let
+        through. Doubled, up to `max_backoff`, every time the trial call fails.
+
+    """
+
+    def __init__(self, failure_threshold=2, backoff=5.0, max_backoff=60.0):
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failures = 0
+        self.opened_at = None
+        self.open_for = backoff
+        # thread making the trial call while half-open
+        self.trial = None
+        self.lock = threading.Lock()
+
+    def allow(self):
+        """Whether the calling thread may make a call."""
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if self.trial is not None or time.time() - self.opened_at < self.open_for:
+                return False
+            self.trial = threading.current_thread()
+            return True
+
+    def release(self):
+        """Give up the trial call of this thread without an outcome, e.g. when it was never sent."""
+        with self.lock:
+            if self.trial is threading.current_thread():
+                self.trial = None
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.open_for = self.backoff
+            self.trial = None
+
+    def record_failure(self):
+        with self.lock:
+            if self.trial is threading.current_thread():
+                self.trial = None
+                self.open_for = min(self.max_backoff, self.open_for * 2)
+                self.opened_at = time.time()
+            elif self.opened_at is None:
+                self.failures += 1
+                if self.failures >= self.failure_threshold:
+                    self.opened_at = time.time()
+            # otherwise a call made before the breaker opened failed late,
+            # which says nothing new about the server
+
+    def is_open(self):
+        return self.opened_at is not None
+
+
+class RequestStats(object):
+    """Thread safe counters of API traffic generated by completion."""
+
+    def __init__(self):
+        self.issued = 0
+        self.retried = 0
+        self.throttled = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+        self.short_circuited = 0
+        self.lock = threading.Lock()
+
+    def incr(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def saved(self):
+        """Number of list calls that didn't reach the API server thanks to caching or coalescing."""
+        return self.coalesced + self.cache_hits
+
+
+def is_retryable(status):
+    return status == 429 or (status is not None and status >= 500)
+
+
+def backoff_delay(attempt, retry_after=None, base=0.2, cap=2.0):
+    """Seconds to wait before retry number `attempt`, honouring a Retry-After header."""
+    if retry_after:
+        try:
+            return min(cap, float(retry_after))
+        except ValueError:
+            pass
+    delay = min(cap, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -10,10 +10,13 @@ class Toolbar(object):
 
     """
 
-    def __init__(self, get_cluster_name, get_namespace, get_user, get_inline_help):
-        self.handler = self._create_toolbar_handler(get_cluster_name, get_namespace, get_user, get_inline_help)
+    def __init__(self, get_cluster_name, get_namespace, get_user, get_inline_help, get_warmup_status=None,
+                 get_api_stats=None, get_offline=None):
+        self.handler = self._create_toolbar_handler(get_cluster_name, get_namespace, get_user, get_inline_help,
+                                                    get_warmup_status, get_api_stats, get_offline)
 
-    def _create_toolbar_handler(self, get_cluster_name, get_namespace, get_user, get_inline_help):
+    def _create_toolbar_handler(self, get_cluster_name, get_namespace, get_user, get_inline_help, get_warmup_status,
+                                get_api_stats, get_offline):
         def get_toolbar_items(_):
             if get_inline_help():
                 help_token = Token.Toolbar.On
@@ -22,7 +25,7 @@ class Toolbar(object):
                 help_token = Token.Toolbar.Off
                 help = "OFF"
 
-            return [
+            items = [
                 (Keyword, ' [F4] Cluster: '),
                 (Token.Toolbar, get_cluster_name()),
                 (Keyword, ' [F5] Namespace: '),
@@ -34,4 +37,25 @@ class Toolbar(object):
                 (Keyword, ' [F10] Exit ')
             ]
 
+            if get_offline and get_offline():
+                items.extend([
+                    (Keyword, ' Server: '),
+                    (Token.Toolbar.Off, 'OFFLINE'),
+                ])
+
+            warmup_status = get_warmup_status() if get_warmup_status else ""
+            if warmup_status:
+                items.extend([
+                    (Keyword, ' Warming cache: '),
+                    (Token.Toolbar, warmup_status),
+                ])
+
+            api_stats = get_api_stats() if get_api_stats else ""
+            if api_stats:
+                items.extend([
+                    (Keyword, ' API calls: '),
+                    (Token.Toolbar, api_stats),
+                ])
+            return items
+
         return get_toolbar_items
@@ -0,0 +1,215 @@
+from __future__ import print_function, absolute_import, unicode_literals
+
+import json
+import zlib
+
+
+PROTOBUF_CONTENT_TYPE = "application/vnd.kubernetes.protobuf"
+
+# prefix of every protobuf encoded object sent by the API server
+PROTOBUF_MAGIC = b"k8s\x00"
+
+# list endpoints across all namespaces, same API groups as `KubectlCompleter.fetch_resources`
+RESOURCE_PATHS = {
+    "pod": "/api/v1/pods",
+    "service": "/api/v1/services",
+    "deployment": "/apis/apps/v1beta1/deployments",
+    "statefulset": "/apis/apps/v1beta1/statefulsets",
+    "node": "/api/v1/nodes",
+    "namespace": "/api/v1/namespaces",
+    "daemonset": "/apis/extensions/v1beta1/daemonsets",
+    "networkpolicy": "/apis/extensions/v1beta1/networkpolicies",
+    "thirdpartyresource": "/apis/extensions/v1beta1/thirdpartyresources",
+    "replicationcontroller": "/api/v1/replicationcontrollers",
+    "replicaset": "/apis/extensions/v1beta1/replicasets",
+    "ingress": "/apis/extensions/v1beta1/ingresses",
+    "endpoints": "/api/v1/endpoints",
+    "configmap": "/api/v1/configmaps",
+    "event": "/api/v1/events",
+    "limitrange": "/api/v1/limitranges",
+    "persistentvolume": "/api/v1/persistentvolumes",
+    "secret": "/api/v1/secrets",
+    "resourcequota": "/api/v1/resourcequotas",
+    "componentstatus": "/api/v1/componentstatuses",
+    "podtemplate": "/api/v1/podtemplates",
+    "serviceaccount": "/api/v1/serviceaccounts",
+    "horizontalpodautoscaler": "/apis/autoscaling/v1/horizontalpodautoscalers",
+    "clusterrole": "/apis/rbac.authorization.k8s.io/v1beta1/clusterroles",
+    "clusterrolebinding": "/apis/rbac.authorization.k8s.io/v1beta1/clusterrolebindings",
+    "job": "/apis/batch/v1/jobs",
+    "cronjob": "/apis/batch/v2alpha1/cronjobs",
+    "scheduledjob": "/apis/batch/v2alpha1/scheduledjobs",
+}
+
+# protobuf field numbers, see k8s.io/apimachinery/pkg/runtime/generated.proto
+# and k8s.io/apimachinery/pkg/apis/meta/v1/generated.proto
+UNKNOWN_RAW = 2
+LIST_ITEMS = 2
+OBJECT_METADATA = 1
+META_NAME = 1
+META_NAMESPACE = 3
+META_LABELS = 11
+MAP_KEY = 1
+MAP_VALUE = 2
+
+WIRE_VARINT = 0
+WIRE_FIXED64 = 1
+WIRE_LENGTH_DELIMITED = 2
+WIRE_FIXED32 = 5
+
+
+class ObjectMeta(object):
+    """The part of an object's metadata completion cares about."""
+
+    __slots__ = ("name", "namespace", "labels")
+
+    def __init__(self, name=None, namespace=None, labels=None):
+        self.name = name
+        self.namespace = namespace
+        self.labels = labels or {}
+
+
+class PartialObject(object):
+    """Stand-in for a client model object that only carries metadata."""
+
+    __slots__ = ("metadata",)
+
+    def __init__(self, metadata):
+        self.metadata = metadata
+
+
+class PartialObjectList(object):
+    """Stand-in for a client model list, with `items` of `PartialObject`."""
+
+    def __init__(self, items):
+        self.items = items
+
+
+def list_metadata(api_client, path, watch=False, _request_timeout=None):
+    """List `path` asking for protobuf and gzip, decoding only object metadata.
+
+    The server falls back to JSON for types it can't encode as protobuf.
+    """
+    headers = {
+        "Accept": "{0}, application/json".format(PROTOBUF_CONTENT_TYPE),
+        "Accept-Encoding": "gzip",
+    }
+    resp = api_client.call_api(path, "GET",
+                               query_params=[("watch", watch)],
+                               header_params=headers,
+                               auth_settings=["BearerToken"],
+                               _return_http_data_only=True,
+                               _preload_content=False,
+                               _request_timeout=_request_timeout)
+    try:
+        raw = resp.read(decode_content=False)
+        encoding = resp.headers.get("Content-Encoding", "")
+        content_type = resp.headers.get("Content-Type", "")
+    finally:
+        resp.release_conn()
+
+    body = zlib.decompress(raw, 16 + zlib.MAX_WBITS) if encoding == "gzip" else raw
+    return PartialObjectList(decode_list(body, content_type))
+
+
+def decode_list(body, content_type):
+    if content_type.startswith(PROTOBUF_CONTENT_TYPE):
+        return decode_protobuf_list(body)
+    return decode_json_list(body)
+
+
+def decode_json_list(body):
+    if isinstance(body, bytes):
+        body = body.decode("utf-8")
+    items = []
+    for item in json.loads(body).get("items") or []:
+        meta = item.get("metadata") or {}
+        items.append(PartialObject(ObjectMeta(meta.get("name"), meta.get("namespace"), meta.get("labels"))))
+    return items
+
+
+def decode_protobuf_list(body):
+    buf = bytearray(body)
+    if buf[:len(PROTOBUF_MAGIC)] != bytearray(PROTOBUF_MAGIC):
+        raise ValueError("response is not a kubernetes protobuf object")
+
+    raw = _find_field(buf, len(PROTOBUF_MAGIC), len(buf), UNKNOWN_RAW)
+    if raw is None:
+        return []
+
+    items = []
+    for field, wire_type, value in _iter_fields(buf, raw[0], raw[1]):
+        if field != LIST_ITEMS or wire_type != WIRE_LENGTH_DELIMITED:
+            continue
+        meta = _find_field(buf, value[0], value[1], OBJECT_METADATA)
+        items.append(PartialObject(_decode_object_meta(buf, *meta) if meta else ObjectMeta()))
+    return items
+
+
+def _decode_object_meta(buf, start, end):
+    meta = ObjectMeta()
+    for field, wire_type, value in _iter_fields(buf, start, end):
+        if wire_type != WIRE_LENGTH_DELIMITED:
+            continue
+        if field == META_NAME:
+            meta.name = _decode_string(buf, value)
+        elif field == META_NAMESPACE:
+            meta.namespace = _decode_string(buf, value)
+        elif field == META_LABELS:
+            key = val = ""
+            for entry_field, _, entry_value in _iter_fields(buf, value[0], value[1]):
+                if entry_field == MAP_KEY:
+                    key = _decode_string(buf, entry_value)
+                elif entry_field == MAP_VALUE:
+                    val = _decode_string(buf, entry_value)
+            meta.labels[key] = val
+    return meta
+
+
+def _decode_string(buf, span):
+    return buf[span[0]:span[1]].decode("utf-8")
+
+
+def _find_field(buf, start, end, wanted):
+    for field, wire_type, value in _iter_fields(buf, start, end):
+        if field == wanted and wire_type == WIRE_LENGTH_DELIMITED:
+            return value
+    return None
+
+
+def _read_varint(buf, pos):
+    result = shift = 0
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if not byte & 0x80:
+            return result, pos
+        shift += 7
+
+
+def _iter_fields(buf, start, end):
+    """Yield `(field number, wire type, value)` for the message in `buf[start:end]`.
+
+    Length delimited values are yielded as `(start, end)` offsets into `buf`
+    so skipped fields are never copied.
+    """
+    pos = start
+    while pos < end:
+        key, pos = _read_varint(buf, pos)
+        field, wire_type = key >> 3, key & 0x7
+        if wire_type == WIRE_VARINT:
+            value, pos = _read_varint(buf, pos)
+        elif wire_type == WIRE_LENGTH_DELIMITED:
+            length, pos = _read_varint(buf, pos)
+            value = (pos, pos + length)
+            pos += length
+        elif wire_type == WIRE_FIXED64:
+            value = None
+            pos += 8
+        elif wire_type == WIRE_FIXED32:
+            value = None
+            pos += 4
+        else:
+            raise ValueError("unsupported protobuf wire type {0}".format(wire_type))
+        yield field, wire_type, value
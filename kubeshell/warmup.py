@@ -0,0 +1,115 @@
+from __future__ import print_function, absolute_import, unicode_literals
+
+import logging
+import threading
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+logger = logging.getLogger(__name__)
+
+
+# resource kinds fetched ahead of the first Tab, most commonly completed first
+WARMUP_RESOURCES = (
+    "namespace",
+    "pod",
+    "deployment",
+    "service",
+    "node",
+    "replicaset",
+    "configmap",
+    "secret",
+)
+
+
+class WarmupRun(object):
+    """State of a single warm-up started by `CacheWarmer.start`."""
+
+    def __init__(self, resources):
+        self.total = len(resources)
+        self.done = 0
+        self.cancelled = threading.Event()
+        self.lock = threading.Lock()
+
+    def finished(self):
+        return self.cancelled.is_set() or self.done >= self.total
+
+
+class CacheWarmer(object):
+    """Fill the completer's resource cache on a bounded pool of threads.
+
+    The worker threads are started once and shared by every warm-up, so
+    starting a new one while list calls of the previous one are still
+    blocked never adds threads; it only replaces the kinds still queued.
+
+    :type completer: KubectlCompleter
+    :param completer: Completer whose cache is invalidated and refilled.
+
+    :type max_workers: int
+    :param max_workers: Upper bound on concurrent list calls to the API server.
+
+    """
+
+    def __init__(self, completer, resources=WARMUP_RESOURCES, max_workers=4):
+        self.completer = completer
+        self.resources = resources
+        self.max_workers = max_workers
+        self.current = None
+        self.pending = queue.Queue()
+        self.workers = []
+        self.lock = threading.Lock()
+
+    def start(self, on_progress=None):
+        with self.lock:
+            self.cancel()
+            self._drain()
+            self.completer.invalidate_cache()
+
+            run = WarmupRun(self.resources)
+            self.current = run
+            for resource in self.resources:
+                self.pending.put((run, resource, on_progress))
+
+            while len(self.workers) < self.max_workers:
+                worker = threading.Thread(target=self._worker)
+                worker.daemon = True
+                worker.start()
+                self.workers.append(worker)
+
+    def cancel(self):
+        # in-flight list calls can't be interrupted; the completer drops their
+        # results once its cache generation has moved on
+        if self.current is not None:
+            self.current.cancelled.set()
+
+    def running(self):
+        return self.current is not None and not self.current.finished()
+
+    def status(self):
+        run = self.current
+        if run is None or run.finished():
+            return ""
+        return "{0}/{1}".format(run.done, run.total)
+
+    def _drain(self):
+        while True:
+            try:
+                self.pending.get_nowait()
+            except queue.Empty:
+                return
+
+    def _worker(self):
+        while True:
+            run, resource, on_progress = self.pending.get()
+            if run.cancelled.is_set():
+                continue
+            try:
+                self.completer.get_resources(resource)
+            except Exception:
+                logger.warning("warming up the %s cache failed", resource, exc_info=True)
+            with run.lock:
+                run.done += 1
+            if on_progress is not None and not run.cancelled.is_set():
+                on_progress()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Compare bytes transferred and decode CPU for pod list responses.
+
+Builds a synthetic list of pods and measures, for each transport, the size
+of the body on the wire and the time to get from that body to (name,
+namespace) pairs:
+
+    json        the current path, deserialized into V1PodList models
+    json+gzip   gzipped JSON, decoded by kubeshell.transport
+    proto+gzip  gzipped protobuf, decoded by kubeshell.transport
+
+ObjectMeta is encoded with its real protobuf field numbers. Spec and status
+are encoded with the same wire format but synthetic field numbers, so their
+sizes are representative of what the API server sends rather than exact.
+
+Usage: python misc/bench_transport.py [number of pods]
+"""
+
+from __future__ import print_function, absolute_import, unicode_literals
+
+import gzip
+import io
+import json
+import sys
+import time
+import zlib
+
+from kubeshell import transport
+
+
+def make_pod(index):
+    name = "frontend-{0}-7d9f8c6b5-x{1:04d}".format(index % 40, index)
+    return {
+        "metadata": {
+            "name": name,
+            "namespace": "team-{0}".format(index % 12),
+            "uid": "6b1f3c1e-1f0a-11e7-93ae-92361f00{0:04d}".format(index),
+            "resourceVersion": str(1000000 + index),
+            "creationTimestamp": "2017-06-01T10:00:00Z",
+            "labels": {"app": "frontend-{0}".format(index % 40), "pod-template-hash": "7d9f8c6b5", "tier": "web"},
+            "annotations": {"kubernetes.io/created-by": json.dumps({"kind": "SerializedReference",
+                                                                    "reference": {"kind": "ReplicaSet",
+                                                                                  "name": name[:-6]}})},
+            "ownerReferences": [{"apiVersion": "extensions/v1beta1", "kind": "ReplicaSet",
+                                 "name": name[:-6], "uid": "5a0e2b0d-1f0a-11e7-93ae-92361f002671",
+                                 "controller": True}],
+        },
+        "spec": {
+            "containers": [{
+                "name": "app",
+                "image": "registry.example.com/frontend:1.4.{0}".format(index % 7),
+                "ports": [{"containerPort": 8080, "protocol": "TCP"}],
+                "env": [{"name": "ENV_{0}".format(i), "value": "value-{0}".format(i)} for i in range(6)],
+                "resources": {"limits": {"cpu": "500m", "memory": "256Mi"},
+                              "requests": {"cpu": "100m", "memory": "128Mi"}},
+                "volumeMounts": [{"name": "default-token-abcde", "readOnly": True,
+                                  "mountPath": "/var/run/secrets/kubernetes.io/serviceaccount"}],
+                "terminationMessagePath": "/dev/termination-log",
+                "imagePullPolicy": "IfNotPresent",
+            }],
+            "volumes": [{"name": "default-token-abcde", "secret": {"secretName": "default-token-abcde"}}],
+            "restartPolicy": "Always",
+            "terminationGracePeriodSeconds": 30,
+            "dnsPolicy": "ClusterFirst",
+            "serviceAccountName": "default",
+            "nodeName": "node-{0}.example.com".format(index % 30),
+            "schedulerName": "default-scheduler",
+        },
+        "status": {
+            "phase": "Running",
+            "conditions": [{"type": t, "status": "True", "lastTransitionTime": "2017-06-01T10:00:05Z"}
+                           for t in ("Initialized", "Ready", "PodScheduled")],
+            "hostIP": "10.0.{0}.{1}".format(index % 30, index % 250),
+            "podIP": "172.16.{0}.{1}".format(index % 250, index % 250),
+            "startTime": "2017-06-01T10:00:00Z",
+            "containerStatuses": [{"name": "app", "ready": True, "restartCount": 0,
+                                   "image": "registry.example.com/frontend:1.4.{0}".format(index % 7),
+                                   "imageID": "docker-pullable://registry.example.com/frontend@sha256:" + "ab" * 32,
+                                   "containerID": "docker://" + "cd" * 32,
+                                   "state": {"running": {"startedAt": "2017-06-01T10:00:03Z"}}}],
+            "qosClass": "Burstable",
+        },
+    }
+
+
+def _varint(value):
+    out = bytearray()
+    while True:
+        byte = value & 0x7f
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, payload):
+    if isinstance(payload, bool) or isinstance(payload, int):
+        return _varint(number << 3 | transport.WIRE_VARINT) + _varint(int(payload))
+    return _varint(number << 3 | transport.WIRE_LENGTH_DELIMITED) + _varint(len(payload)) + payload
+
+
+def _encode_value(number, value):
+    if isinstance(value, dict):
+        return _field(number, _encode_message(value))
+    if isinstance(value, list):
+        return b"".join(_encode_value(number, item) for item in value)
+    if isinstance(value, (bool, int)):
+        return _field(number, value)
+    return _field(number, value.encode("utf-8"))
+
+
+def _encode_message(obj, numbers=None):
+    numbers = numbers or {}
+    out = []
+    for index, key in enumerate(sorted(obj)):
+        out.append(_encode_value(numbers.get(key, index + 20), obj[key]))
+    return b"".join(out)
+
+
+def _encode_map(number, mapping):
+    return b"".join(_field(number, _field(transport.MAP_KEY, k.encode("utf-8")) +
+                           _field(transport.MAP_VALUE, v.encode("utf-8")))
+                    for k, v in sorted(mapping.items()))
+
+
+def encode_object(obj):
+    meta = dict(obj["metadata"])
+    labels = meta.pop("labels", {})
+    annotations = meta.pop("annotations", {})
+    meta_bytes = _encode_message(meta, {"name": transport.META_NAME, "namespace": transport.META_NAMESPACE})
+    meta_bytes += _encode_map(transport.META_LABELS, labels) + _encode_map(12, annotations)
+    out = _field(transport.OBJECT_METADATA, meta_bytes)
+    for number, key in ((2, "spec"), (3, "status")):
+        if key in obj:
+            out += _encode_value(number, obj[key])
+    return out
+
+
+def encode_list(objects, kind="PodList"):
+    """Encode `objects` the way the API server sends a protobuf list response."""
+    items = b"".join(_field(transport.LIST_ITEMS, encode_object(obj)) for obj in objects)
+    object_list = _field(1, _field(2, b"1234567")) + items
+    type_meta = _field(1, b"v1") + _field(2, kind.encode("utf-8"))
+    unknown = _field(1, type_meta) + _field(transport.UNKNOWN_RAW, object_list) + _field(4, b"")
+    return transport.PROTOBUF_MAGIC + unknown
+
+
+def gzip_bytes(data):
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode="wb") as fd:
+        fd.write(data)
+    return buf.getvalue()
+
+
+class FakeResponse(object):
+
+    def __init__(self, data):
+        self.data = data
+
+
+def best_of(fn, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.time()
+        fn()
+        elapsed = time.time() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    pods = [make_pod(i) for i in range(count)]
+    json_body = json.dumps({"kind": "PodList", "apiVersion": "v1", "metadata": {}, "items": pods}).encode("utf-8")
+    json_gzip = gzip_bytes(json_body)
+    proto_gzip = gzip_bytes(encode_list(pods))
+
+    from kubernetes import client
+    api_client = client.ApiClient()
+
+    def current_path():
+        ret = api_client.deserialize(FakeResponse(json_body.decode("utf-8")), "V1PodList")
+        return [(i.metadata.name, i.metadata.namespace) for i in ret.items]
+
+    def gunzip(data):
+        return zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+    def json_gzip_path():
+        items = transport.decode_json_list(gunzip(json_gzip))
+        return [(i.metadata.name, i.metadata.namespace) for i in items]
+
+    def proto_gzip_path():
+        items = transport.decode_protobuf_list(gunzip(proto_gzip))
+        return [(i.metadata.name, i.metadata.namespace) for i in items]
+
+    expected = current_path()
+    assert json_gzip_path() == expected and proto_gzip_path() == expected
+
+    print("{0} pods".format(count))
+    print("{0:<12} {1:>12} {2:>12}".format("transport", "wire bytes", "decode ms"))
+    for label, body, fn in (("json", json_body, current_path),
+                            ("json+gzip", json_gzip, json_gzip_path),
+                            ("proto+gzip", proto_gzip, proto_gzip_path)):
+        print("{0:<12} {1:>12} {2:>12.1f}".format(label, len(body), best_of(fn) * 1000))
+
+
+if __name__ == "__main__":
+    main()